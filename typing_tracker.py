@@ -5,9 +5,13 @@ Captures typing sessions and saves them as JSON files with human-readable timest
 
 import json
 import os
+import queue
+import sys
 import threading
 import time
-from datetime import datetime
+from collections import deque
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 
 try:
@@ -17,6 +21,75 @@ except ImportError:
     print("ERROR: pynput not installed. Run: pip install pynput")
     PLATFORM_SUPPORTED = False
 
+try:
+    import orjson
+except ImportError:
+    orjson = None  # Fall back to the stdlib json encoder
+
+
+def _dumps_indented(obj) -> bytes:
+    """Serialize obj as indented JSON bytes in a single buffer"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2).encode('utf-8')
+
+
+def _atomic_write_json(path: str, obj):
+    """Write obj as JSON via a synced temp file and rename, so readers never see a partial file"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_dumps_indented(obj))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+# Pre-bound callables used on the keystroke and persist paths
+_now = datetime.now
+_monotonic_ns = time.monotonic_ns
+_join = os.path.join
+
+_NS_PER_MINUTE = 60 * 1_000_000_000
+
+# WPM is computed over samples from this trailing window
+_WPM_WINDOW_NS = _NS_PER_MINUTE
+
+# Carriage returns are stored verbatim and normalized to newlines when saving
+_NORMALIZE_TABLE = str.maketrans({'\r': '\n'})
+
+# Slotted dataclasses need Python 3.10+; older interpreters get a regular __dict__
+_DATACLASS_OPTIONS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(**_DATACLASS_OPTIONS)
+class Session:
+    """Metrics and content of the continuous typing session"""
+    session_start: str
+    session_end: Optional[str] = None
+    content_parts: List[str] = field(default_factory=list)  # Joined only when saving
+    character_count: int = 0
+    word_count: int = 0  # Maintained incrementally as words start/are erased
+    total_keystrokes: int = 0
+    duration_seconds: float = 0
+    last_activity: str = ""
+    
+    def get_content(self) -> str:
+        """Materialize the session content from its fragments"""
+        return ''.join(self.content_parts).translate(_NORMALIZE_TABLE)
+    
+    def to_dict(self) -> Dict:
+        """Session file representation"""
+        return {
+            'session_start': self.session_start,
+            'session_end': self.session_end,
+            'content': self.get_content(),
+            'character_count': self.character_count,
+            'word_count': self.word_count,
+            'total_keystrokes': self.total_keystrokes,
+            'duration_seconds': self.duration_seconds,
+            'last_activity': self.last_activity
+        }
+
 
 class TypingTracker:
     """Minimal typing activity tracker with continuous session"""
@@ -24,20 +97,46 @@ class TypingTracker:
     def __init__(self, output_dir: str = "/Users/pk/Desktop/content/typing-output"):
         self.output_dir = output_dir
         self.is_running = False
-        self.current_session = None
-        self.last_activity = None
+        self.current_session: Optional[Session] = None
+        self._last_activity_ns = 0  # time.monotonic_ns() of the last key event (0 = none yet)
         self.keyboard_listener = None
         self.session_gap_seconds = 5  # Add paragraph break after 5 seconds of inactivity
         self.session_filename = None  # Store the single session filename
+        self._prev_was_separator = True  # Whether the content ends in whitespace
+        self._session_lock = threading.Lock()  # Guards session state shared with the listener thread
         
         # WPM tracking
-        self.word_timestamps = []  # Store (timestamp, word_count) for WPM calculation
+        self.word_timestamps = deque()  # Store (monotonic_ns, word_count) for WPM calculation
         self.last_stats_display = None
         self.stats_display_interval = 5 # Show stats every 5 seconds
         
+        # In-progress session is flushed by the I/O worker at most once per interval
+        self._flush_interval = 2.0
+        self._dirty = False
+        self._persist_lock = threading.Lock()  # Serializes snapshot writes
+        
+        # File I/O runs on a background worker so the keyboard callback never blocks
+        self._io_queue = queue.SimpleQueue()
+        self._io_thread = None
+        self._stats_thread = None
+        self._stop_event = threading.Event()  # Set by stop_tracking to wake sleeping threads
+        self._session_file_requested = False
+        
+        self._key_name_cache: Dict = {}  # Special key -> name without the 'Key.' prefix
+        
         # Ensure output directory exists
         os.makedirs(self.output_dir, exist_ok=True)
         
+    @property
+    def session_gap_seconds(self) -> float:
+        """Inactivity (in seconds) after which a paragraph break is added"""
+        return self._gap_ns / 1e9
+    
+    @session_gap_seconds.setter
+    def session_gap_seconds(self, seconds: float):
+        # Stored as integer nanoseconds for the per-keystroke gap check
+        self._gap_ns = int(seconds * 1e9)
+    
     def start_tracking(self) -> bool:
         """Start tracking typing activity"""
         if not PLATFORM_SUPPORTED:
@@ -58,129 +157,210 @@ class TypingTracker:
         # Initialize the continuous session (will create file on first keystroke)
         self._initialize_session(datetime.now())
         
+        # Start background I/O worker
+        self._io_thread = threading.Thread(target=self._io_worker_loop, daemon=True)
+        self._io_thread.start()
+        
         # Start background stats display
-        import threading
-        stats_thread = threading.Thread(target=self._stats_display_loop, daemon=True)
-        stats_thread.start()
+        self._stats_thread = threading.Thread(target=self._stats_display_loop, daemon=True)
+        self._stats_thread.start()
         
         return True
     
     def _on_key_press(self, key):
         """Capture keystroke and manage continuous session"""
         try:
-            timestamp = datetime.now()
+            now_ns = _monotonic_ns()
+            session = self.current_session
             
-            # Create session file on first keystroke
-            if not self.session_filename:
-                self._create_session_file(timestamp)
+            # Create session file on first keystroke (handed off to the I/O worker)
+            if not self._session_file_requested:
+                self._session_file_requested = True
+                self._io_queue.put(lambda ts=_now(): self._create_session_file(ts))
             
             # Handle different key types
-            if hasattr(key, 'char') and key.char:
+            try:
                 char = key.char
+            except AttributeError:
+                char = None
+            
+            if char:
                 key_type = 'character'
             else:
-                char = str(key).replace('Key.', '')
+                char = self._key_name_cache.get(key)
+                if char is None:
+                    char = str(key).replace('Key.', '')
+                    self._key_name_cache[key] = char
                 key_type = 'special'
             
-            # Check if we need to add a paragraph break (5+ seconds gap)
-            if (self.last_activity and 
-                (timestamp - self.last_activity).total_seconds() > self.session_gap_seconds):
-                # Add paragraph break for long gap
-                self.current_session['content'] += '\n\n'
-            
-            # Add keystroke to current session
-            if key_type == 'character':
-                if char in ['\r', '\n']:
-                    self.current_session['content'] += '\n'
-                elif char == '\t':
-                    self.current_session['content'] += '\t'
-                else:
-                    self.current_session['content'] += char
-                    
-                self.current_session['character_count'] += 1
+            with self._session_lock:
+                # Check if we need to add a paragraph break (5+ seconds gap)
+                if self._last_activity_ns and now_ns - self._last_activity_ns > self._gap_ns:
+                    # Add paragraph break for long gap
+                    session.content_parts.append('\n\n')
+                    session.character_count += 2
+                    self._prev_was_separator = True
                 
-            elif char == 'space':
-                self.current_session['content'] += ' '
-                self.current_session['character_count'] += 1
-                
-            elif char == 'backspace' and self.current_session['content']:
-                self.current_session['content'] = self.current_session['content'][:-1]
-                self.current_session['character_count'] = max(0, self.current_session['character_count'] - 1)
-            
-            # Update session metrics
-            self.current_session['last_activity'] = timestamp.isoformat()
-            self.current_session['total_keystrokes'] += 1
-            self.last_activity = timestamp
-            
-            # Track words for WPM calculation (on space or newline)
-            if key_type == 'character' and char in [' ', '\r', '\n'] or char == 'space':
-                current_word_count = len(self.current_session['content'].split())
-                self.word_timestamps.append((timestamp, current_word_count))
+                # Add keystroke to current session
+                if key_type == 'character':
+                    session.content_parts.append(char)
+                    session.character_count += 1
+                    
+                    # A non-separator following a separator starts a new word
+                    is_separator = char.isspace()
+                    if not is_separator and self._prev_was_separator:
+                        session.word_count += 1
+                    self._prev_was_separator = is_separator
+                    if is_separator:
+                        self._record_word_sample(now_ns)
+                else:
+                    handler = _SPECIAL_DISPATCH.get(char)
+                    if handler is not None:
+                        handler(self, now_ns)
                 
-                # Keep only last 1 minute of data
-                cutoff_time = timestamp.timestamp() - 60  # 1 minute ago
-                self.word_timestamps = [
-                    (ts, wc) for ts, wc in self.word_timestamps 
-                    if ts.timestamp() > cutoff_time
-                ]
+                # Update session metrics
+                session.total_keystrokes += 1
+                self._last_activity_ns = now_ns
+                self._dirty = True
             
         except Exception as e:
             print(f"Error capturing keystroke: {e}")
     
+    def _append_separator(self, text: str):
+        """Append a whitespace keystroke to the session content"""
+        session = self.current_session
+        session.content_parts.append(text)
+        session.character_count += 1
+        self._prev_was_separator = True
+    
+    def _record_word_sample(self, now_ns: int):
+        """Track words for WPM calculation (on space or newline)"""
+        self.word_timestamps.append((now_ns, self.current_session.word_count))
+        
+        # Keep only last 1 minute of data
+        self._prune_word_timestamps(now_ns - _WPM_WINDOW_NS)
+    
+    def _handle_space(self, now_ns: int):
+        """Handle space key"""
+        self._append_separator(' ')
+        self._record_word_sample(now_ns)
+    
+    def _handle_enter(self, now_ns: int):
+        """Handle enter key as a newline"""
+        self._append_separator('\n')
+        self._record_word_sample(now_ns)
+    
+    def _handle_tab(self, now_ns: int):
+        """Handle tab key"""
+        self._append_separator('\t')
+    
+    def _handle_backspace(self, now_ns: int):
+        """Remove the last typed character"""
+        session = self.current_session
+        content_parts = session.content_parts
+        if not content_parts:
+            return
+        
+        last = content_parts[-1]
+        if len(last) == 1:
+            content_parts.pop()
+        else:
+            content_parts[-1] = last[:-1]
+        session.character_count = max(0, session.character_count - 1)
+        
+        # Peek at the new last char: erasing the first char of a word removes the word
+        self._prev_was_separator = not content_parts or content_parts[-1][-1].isspace()
+        if not last[-1].isspace() and self._prev_was_separator:
+            session.word_count = max(0, session.word_count - 1)
+    
     def _on_key_release(self, key):
         """Handle key release (minimal processing)"""
-        self.last_activity = datetime.now()
+        self._last_activity_ns = _monotonic_ns()
     
     def _initialize_session(self, timestamp: datetime):
         """Initialize the continuous session structure"""
-        self.current_session = {
-            'session_start': timestamp.isoformat(),
-            'session_end': None,
-            'content': '',
-            'character_count': 0,
-            'word_count': 0,
-            'total_keystrokes': 0,
-            'duration_seconds': 0,
-            'last_activity': timestamp.isoformat()
-        }
+        self._prev_was_separator = True
+        self.current_session = Session(
+            session_start=timestamp.isoformat(),
+            last_activity=timestamp.isoformat()
+        )
     
     def _create_session_file(self, timestamp: datetime):
         """Create the session file when first keystroke is detected"""
         date_str = timestamp.strftime("%Y-%m-%d")
         time_str = timestamp.strftime("%I-%M%p").lower()
         self.session_filename = f"{date_str}_Typing_Session_{time_str}.json"
-        session_filepath = os.path.join(self.output_dir, self.session_filename)
         
         print(f"📝 Session started: {self.session_filename}")
         
-        # Save initial session file
-        with open(session_filepath, 'w') as f:
-            json.dump(self.current_session, f, indent=2)
+        # File is written by the I/O worker on its next flush, not on the keystroke path
+    
+    def _persist_snapshot(self):
+        """Atomically write the current session state to the session file"""
+        with self._persist_lock:
+            with self._session_lock:
+                if self._last_activity_ns:
+                    idle_ns = _monotonic_ns() - self._last_activity_ns
+                    last_activity = _now() - timedelta(microseconds=idle_ns // 1000)
+                    self.current_session.last_activity = last_activity.isoformat()
+                # Copy only the fragment list here; joining the content happens off the lock
+                session = replace(self.current_session,
+                                  content_parts=list(self.current_session.content_parts))
+            
+            session_filepath = _join(self.output_dir, self.session_filename)
+            _atomic_write_json(session_filepath, session.to_dict())
+    
+    def _prune_word_timestamps(self, cutoff_time: int):
+        """Drop WPM samples older than the cutoff (caller holds _session_lock)"""
+        word_timestamps = self.word_timestamps
+        while word_timestamps and word_timestamps[0][0] < cutoff_time:
+            word_timestamps.popleft()
+    
+    def _run_pending_io_jobs(self):
+        """Run queued one-off I/O jobs until the queue is empty"""
+        while True:
+            try:
+                job = self._io_queue.get_nowait()
+            except queue.Empty:
+                return
+            job()
+    
+    def _io_worker_loop(self):
+        """Background thread that runs queued file I/O jobs and flushes dirty sessions"""
+        while True:
+            stopped = self._stop_event.wait(self._flush_interval)
+            
+            try:
+                self._run_pending_io_jobs()
+                
+                # Coalesce all changes since the last flush into a single write
+                if self._dirty and self.session_filename:
+                    self._dirty = False
+                    try:
+                        self._persist_snapshot()
+                    except Exception:
+                        self._dirty = True  # Retry on the next flush
+                        raise
+            except Exception as e:
+                print(f"Error in background I/O: {e}")
+            
+            if stopped:
+                return
     
     def _calculate_wpm_last_1min(self) -> float:
-        """Calculate WPM for the last 1 minute"""
-        if len(self.word_timestamps) < 2:
-            return 0.0
-        
-        # Get time span and word count for last 1 minute
-        now = datetime.now()
-        cutoff_time = now.timestamp() - 60  # 1 minute ago
-        
+        """Calculate WPM for the last 1 minute (caller holds _session_lock)"""
         # Filter to last 1 minute
-        recent_words = [
-            (ts, wc) for ts, wc in self.word_timestamps 
-            if ts.timestamp() > cutoff_time
-        ]
+        self._prune_word_timestamps(_monotonic_ns() - _WPM_WINDOW_NS)
         
-        if len(recent_words) < 2:
+        if not self.word_timestamps:
             return 0.0
         
-        # Calculate words and time span
-        first_timestamp, first_word_count = recent_words[0]
-        last_timestamp, last_word_count = recent_words[-1]
+        first_timestamp, first_word_count = self.word_timestamps[0]
+        last_timestamp, last_word_count = self.word_timestamps[-1]
         
+        # Calculate words and time span
         words_typed = last_word_count - first_word_count
-        time_span_minutes = (last_timestamp.timestamp() - first_timestamp.timestamp()) / 60
+        time_span_minutes = (last_timestamp - first_timestamp) / _NS_PER_MINUTE
         
         if time_span_minutes <= 0:
             return 0.0
@@ -191,17 +371,19 @@ class TypingTracker:
         """Background thread to display typing stats"""
         while self.is_running:
             try:
-                time.sleep(self.stats_display_interval)
+                if self._stop_event.wait(self.stats_display_interval):
+                    return
                 
                 if self.current_session and self.session_filename:
-                    current_words = len(self.current_session['content'].split())
-                    wpm_1min = self._calculate_wpm_last_1min()
+                    with self._session_lock:
+                        current_words = self.current_session.word_count
+                        wpm_1min = self._calculate_wpm_last_1min()
                     
                     print(f"📊 Words: {current_words} | WPM (1min): {wpm_1min:.1f}")
                     
             except Exception as e:
                 print(f"Error in stats display: {e}")
-                time.sleep(10)
+                self._stop_event.wait(10)
     
     def _save_session(self):
         """Save the final session when stopping"""
@@ -210,18 +392,18 @@ class TypingTracker:
             
         # Finalize session
         end_time = datetime.now()
-        start_time = datetime.fromisoformat(self.current_session['session_start'])
-        
-        self.current_session['session_end'] = end_time.isoformat()
-        self.current_session['duration_seconds'] = (end_time - start_time).total_seconds()
-        self.current_session['word_count'] = len(self.current_session['content'].split())
+        with self._session_lock:
+            start_time = datetime.fromisoformat(self.current_session.session_start)
+            
+            self.current_session.session_end = end_time.isoformat()
+            self.current_session.duration_seconds = (end_time - start_time).total_seconds()
+            character_count = self.current_session.character_count
+            word_count = self.current_session.word_count
         
         # Save final session file
-        session_filepath = os.path.join(self.output_dir, self.session_filename)
-        with open(session_filepath, 'w') as f:
-            json.dump(self.current_session, f, indent=2)
+        self._persist_snapshot()
         
-        print(f"💾 Session saved: {self.current_session['character_count']} chars, {self.current_session['word_count']} words")
+        print(f"💾 Session saved: {character_count} chars, {word_count} words")
         print(f"📁 File: {self.session_filename}")
     
     
@@ -232,18 +414,37 @@ class TypingTracker:
             
         self.is_running = False
         
+        # Stop keyboard listener first so no keystroke can queue I/O after the worker exits
+        if self.keyboard_listener:
+            self.keyboard_listener.stop()
+        
+        self._stop_event.set()
+        
+        if self._stats_thread:
+            self._stats_thread.join()
+        
+        # Let the I/O worker finish, then run anything queued after its last pass
+        if self._io_thread:
+            self._io_thread.join()
+        self._run_pending_io_jobs()
+        
         # Save current session
         if self.current_session:
             self._save_session()
         
-        # Stop keyboard listener
-        if self.keyboard_listener:
-            self.keyboard_listener.stop()
-        
         print("\n🛑 Typing tracker stopped")
         print(f"📁 Output saved to: {self.output_dir}")
 
 
+# Special keys that edit the session content, by pynput Key name
+_SPECIAL_DISPATCH = {
+    'space': TypingTracker._handle_space,
+    'backspace': TypingTracker._handle_backspace,
+    'tab': TypingTracker._handle_tab,
+    'enter': TypingTracker._handle_enter,
+}
+
+
 def main():
     """Main entry point"""
     tracker = TypingTracker()
@@ -252,9 +453,8 @@ def main():
         return
     
     try:
-        # Keep running until interrupted
-        while tracker.is_running:
-            time.sleep(1)
+        # Block until the listener stops or we are interrupted
+        tracker.keyboard_listener.join()
     except KeyboardInterrupt:
         print("\n🔄 Shutting down gracefully...")
     finally: